@@ -1,24 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+import asyncio
+import atexit
+import httpx
+import lxml.html
+from lxml import etree
+import orjson
 import os
-import urllib3
+import queue
 import threading
+import time
 import argparse
 import sys
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 # Excel export (required)
 try:
-    import pandas as pd
-    import openpyxl  # ensure engine available
+    import xlsxwriter  # ensure workbook writer available
 except Exception:
     # Fail fast with clear instruction
-    sys.exit("Error: pandas and openpyxl are required. Install: python -m pip install -r requirements.txt")
-
-# ================= SSL FIX =================
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    sys.exit("Error: xlsxwriter is required. Install: python -m pip install -r requirements.txt")
 
 # ================= CONFIG =================
 # Default configuration (can be overridden via CLI flags or interactive prompts)
@@ -30,58 +30,146 @@ HEADERS = {
     "Content-Type": "application/x-www-form-urlencoded",
 }
 
+# Pre-encoded form body; only the hall ticket number changes between requests
+PAYLOAD_TMPL = b"mbstatus=SEARCH&htno=%s&Submit.x=25&Submit.y=8"
+
 START_HT = 110624861001
 END_HT = 110624861064
 
-MAX_WORKERS = 15  # aggressive
+MAX_WORKERS = 100  # requests in flight at once (single event loop, no thread per request)
+# Threads parsing fetched pages; lxml releases the GIL while it parses
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Retries: failed connects are retried by the transport, gateway errors by fetch_result
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.2  # seconds, doubled on each retry
+RETRY_STATUSES = {502, 503, 504}
+
+# Result pages carry this marker; bodies without it are NO_RESULT pages
+RESULT_MARKER = b"Personal Details"
 OUTPUT_FILE = "ou_results.xlsx"
 # Temporary NDJSON file used while incrementally appending results (final output will be Excel)
 NDJSON_FILE = "ou_results.ndjson"
 
 # Auto-excel options
 AUTO_EXCEL = True
-AUTO_EXCEL_INTERVAL = 10  # seconds
+AUTO_EXCEL_INTERVAL = 10  # seconds between threshold checks when no signal arrives
+# Rebuild the workbook only once this many new results arrived, or when the
+# oldest result not yet in a build has waited this long
+AUTO_EXCEL_MIN_ROWS = 100
+AUTO_EXCEL_MAX_AGE = 60  # seconds
 PROTECT_PASSWORD = None
 
 # Internal sync primitives for auto-excel
 auto_excel_event = threading.Event()
 auto_excel_stop = threading.Event()
 auto_excel_thread = None
+# Results count at the last auto-excel build and arrival time of the first
+# result since then, None while every result is built (guarded by lock)
+last_excel_count = 0
+first_unbuilt_time = None
+
+# NDJSON group commit: one writer thread batches queued lines and fsyncs
+# after BATCH_SIZE lines or FSYNC_INTERVAL_MS, whichever comes first
+BATCH_SIZE = 64
+FSYNC_INTERVAL_MS = 200
+ndjson_queue = queue.Queue()
+ndjson_writer_thread = None
+ndjson_fh = None  # staging file handle, opened once per run
 
 # =========================================
 
-session = requests.Session()
+# Compiled once and reused for every page: rows of the personal details (AutoNumber3),
+# marks (AutoNumber4) and result (AutoNumber5) tables, plus per-row cells and cell text
+_XP_T3_ROWS = etree.XPath('(//*[@id="AutoNumber3"])[1]//tr')
+_XP_T4_ROWS = etree.XPath('(//*[@id="AutoNumber4"])[1]//tr')
+_XP_T5_ROWS = etree.XPath('(//*[@id="AutoNumber5"])[1]//tr')
+_XP_TDS = etree.XPath(".//td")
+_XP_TEXT = etree.XPath(".//text()", smart_strings=False)
+
+# lxml parsers must not be shared between threads, so each thread keeps its own per charset
+_html_parsers = threading.local()
+
 lock = threading.Lock()
-results = []
+results_count = 0  # results queued so far this run (the NDJSON file is the only copy)
 
 
 def clear_old_results():
-    # Truncate NDJSON staging file so we can append NDJSON lines as results arrive
-    with open(NDJSON_FILE, "w", encoding="utf-8") as f:
-        f.write("")
+    # Truncate the NDJSON staging file and keep it open for the writer thread
+    global ndjson_fh
+    ndjson_fh = open(NDJSON_FILE, "wb")
 
 
 def append_result(data):
-    # Append a single JSON object as one line (NDJSON) and fsync to disk
+    # Queue a single JSON object as one NDJSON line; the writer thread persists it
+    global results_count, first_unbuilt_time
+    ndjson_queue.put(orjson.dumps(data) + b"\n")
     with lock:
-        with open(NDJSON_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(data, ensure_ascii=False) + "\n")
-            f.flush()
-            try:
-                os.fsync(f.fileno())
-            except Exception:
-                pass
-    # signal the auto-excel worker that new data is available
-    if AUTO_EXCEL:
+        results_count += 1
+        if first_unbuilt_time is None:
+            first_unbuilt_time = time.monotonic()
+        due = AUTO_EXCEL and _auto_excel_due()
+    # only wake the auto-excel worker once a rebuild threshold is crossed
+    if due:
         auto_excel_event.set()
 
 
-def save_results():
-    # Optional: write the in-memory results as a JSON array (overwrites file)
-    with lock:
-        with open(NDJSON_FILE, "w", encoding="utf-8") as f:
-            for item in results:
-                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+def _fsync(f):
+    f.flush()
+    try:
+        os.fsync(f.fileno())
+    except Exception:
+        pass
+
+
+def _ndjson_writer():
+    """Drain queued NDJSON lines into ndjson_fh, fsyncing once per batch.
+    A None on the queue flushes what is pending and stops the writer.
+    """
+    interval = FSYNC_INTERVAL_MS / 1000
+    pending = 0
+    last_sync = time.monotonic()
+    stopping = False
+    while not stopping:
+        timeout = max(0.0, last_sync + interval - time.monotonic()) if pending else None
+        batch = []
+        try:
+            while len(batch) < BATCH_SIZE:
+                line = ndjson_queue.get(timeout=timeout) if not batch else ndjson_queue.get_nowait()
+                if line is None:
+                    stopping = True
+                    break
+                batch.append(line)
+        except queue.Empty:
+            pass
+        if batch:
+            ndjson_fh.write(b"".join(batch))
+            # flush so the auto-excel worker sees the lines before the fsync
+            ndjson_fh.flush()
+            pending += len(batch)
+        if pending and (stopping or pending >= BATCH_SIZE or time.monotonic() - last_sync >= interval):
+            _fsync(ndjson_fh)
+            pending = 0
+            last_sync = time.monotonic()
+
+
+def start_ndjson_writer():
+    global ndjson_writer_thread
+    ndjson_writer_thread = threading.Thread(target=_ndjson_writer, daemon=True)
+    ndjson_writer_thread.start()
+    # make sure queued lines reach disk even if the run is interrupted
+    atexit.register(stop_ndjson_writer)
+
+
+def stop_ndjson_writer():
+    global ndjson_writer_thread, ndjson_fh
+    if ndjson_writer_thread:
+        ndjson_queue.put(None)
+        ndjson_writer_thread.join()
+        ndjson_writer_thread = None
+    if ndjson_fh:
+        ndjson_fh.close()
+        ndjson_fh = None
 
 
 def generate_excel():
@@ -90,38 +178,49 @@ def generate_excel():
     """
     try:
         # import lazily to avoid circular or heavy imports at module load
-        from json_to_excel import load_items, items_to_excel
+        from json_to_excel import iter_entries, entries_to_excel
     except Exception as e:
         print("Error: can't import json_to_excel helpers:", e)
         return
 
+    # Only called once new results are in the staging file, so it is never empty.
+    # A single read feeds every sheet, so lines the writer thread appends meanwhile
+    # (or a torn trailing line, which is skipped) cannot make the sheets disagree
     try:
-        items = load_items(Path(NDJSON_FILE))
-    except Exception as e:
-        print("Error reading NDJSON for Excel generation:", e)
-        return
-
-    if not items:
-        # nothing to write
-        return
-
-    try:
-        items_to_excel(items, Path(OUTPUT_FILE), PROTECT_PASSWORD)
+        entries_to_excel(iter_entries(Path(NDJSON_FILE)), Path(OUTPUT_FILE), PROTECT_PASSWORD)
         print(f"Auto Excel: wrote {OUTPUT_FILE}")
     except Exception as e:
         print("Error while generating Excel:", e)
 
 
+def _auto_excel_due():
+    # Caller holds lock
+    new_rows = results_count - last_excel_count
+    if new_rows >= AUTO_EXCEL_MIN_ROWS:
+        return True
+    return first_unbuilt_time is not None and time.monotonic() - first_unbuilt_time >= AUTO_EXCEL_MAX_AGE
+
+
 def _auto_excel_worker():
-    """Background worker that wakes on events or interval and regenerates Excel."""
+    """Background worker that regenerates Excel once AUTO_EXCEL_MIN_ROWS new results
+    arrived or the oldest unbuilt result is AUTO_EXCEL_MAX_AGE seconds old.
+    append_result signals the row threshold; the interval timeout catches the age one.
+    The final workbook is always written by main() at shutdown.
+    """
+    global last_excel_count, first_unbuilt_time
     interval = AUTO_EXCEL_INTERVAL
     while not auto_excel_stop.is_set():
-        # wait until either event is set (new data) or timeout
+        # wait until either event is set (threshold crossed) or timeout
         auto_excel_event.wait(interval)
         if auto_excel_stop.is_set():
             break
-        # clear the event and generate
         auto_excel_event.clear()
+        with lock:
+            if not _auto_excel_due():
+                continue
+            # results arriving from here on wait for the next build
+            last_excel_count = results_count
+            first_unbuilt_time = None
         try:
             generate_excel()
         except Exception as e:
@@ -146,71 +245,110 @@ def stop_auto_excel():
         auto_excel_thread.join(timeout=5)
 
 
-def fetch_result(htno):
-    payload = {
-        "mbstatus": "SEARCH",
-        "htno": htno,
-        "Submit.x": "25",
-        "Submit.y": "8",
-    }
+def _html_parser(encoding):
+    parsers = getattr(_html_parsers, "by_encoding", None)
+    if parsers is None:
+        parsers = _html_parsers.by_encoding = {}
+    if encoding not in parsers:
+        # encoding=None lets lxml take the charset from the page's <meta> tag
+        parsers[encoding] = lxml.html.HTMLParser(encoding=encoding)
+    return parsers[encoding]
 
-    response = session.post(
-        URL, data=payload, headers=HEADERS, timeout=15, verify=False
-    )
 
-    if "Personal Details" not in response.text:
-        return None
+def _cell_text(td):
+    # Same as BeautifulSoup's get_text(strip=True)
+    return "".join(s.strip() for s in _XP_TEXT(td))
 
-    soup = BeautifulSoup(response.text, "html.parser")
 
-    table3 = soup.find(id="AutoNumber3")
-    if not table3:
+async def _read_result_page(response):
+    """Return the body of a result page, or None for a page without RESULT_MARKER.
+
+    Each chunk is checked for the marker as it streams in, so the body is never
+    joined and rescanned; the marker can sit anywhere in the page. NO_RESULT pages
+    are read to the end so the keep-alive connection stays reusable.
+    """
+    chunks = []
+    found = False
+    tail = b""  # end of the previous chunk, in case the marker spans two chunks
+    keep = len(RESULT_MARKER) - 1
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        if not found:
+            window = tail + chunk
+            found = RESULT_MARKER in window
+            tail = window[-keep:]
+    if not found:
+        return None
+    return b"".join(chunks)
+
+
+async def fetch_page(client, htno):
+    """POST one hall ticket; return (body, charset) for a result page, or None."""
+    body = PAYLOAD_TMPL % htno.encode("ascii")
+    for attempt in range(MAX_RETRIES + 1):
+        async with client.stream("POST", URL, content=body) as response:
+            retry = response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES
+            if not retry:
+                content = await _read_result_page(response)
+        if not retry:
+            break
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    if content is None:
         return None
+    return content, response.charset_encoding
+
 
-    rows = table3.find_all("tr")
+def parse_result(content, charset):
+    """Extract student, marks and result from a result page (runs on the parse pool)."""
+    # bytes go straight to lxml; the header charset wins over the page's <meta> tag
+    tree = lxml.html.fromstring(content, parser=_html_parser(charset))
+
+    rows = _XP_T3_ROWS(tree)
     try:
+        r1, r2, r3 = _XP_TDS(rows[1]), _XP_TDS(rows[2]), _XP_TDS(rows[3])
         student = {
-            "hallticket": rows[1].find_all("td")[1].get_text(strip=True),
-            "gender": rows[1].find_all("td")[3].get_text(strip=True),
-            "name": rows[2].find_all("td")[1].get_text(strip=True),
-            "father": rows[2].find_all("td")[3].get_text(strip=True),
-            "course": rows[3].find_all("td")[1].get_text(strip=True),
+            "hallticket": _cell_text(r1[1]),
+            "gender": _cell_text(r1[3]),
+            "name": _cell_text(r2[1]),
+            "father": _cell_text(r2[3]),
+            "course": _cell_text(r3[1]),
         }
     except Exception:
         return None
 
     marks = []
-    table4 = soup.find(id="AutoNumber4")
-    if table4:
-        for row in table4.find_all("tr")[2:]:
-            cols = row.find_all("td")
-            if len(cols) >= 4:
-                marks.append({
-                    "code": cols[0].get_text(strip=True),
-                    "subject": cols[1].get_text(strip=True),
-                    "credits": cols[2].get_text(strip=True),
-                    "grade": cols[3].get_text(strip=True),
-                })
+    for row in _XP_T4_ROWS(tree)[2:]:
+        cols = _XP_TDS(row)
+        if len(cols) >= 4:
+            marks.append({
+                "code": _cell_text(cols[0]),
+                "subject": _cell_text(cols[1]),
+                "credits": _cell_text(cols[2]),
+                "grade": _cell_text(cols[3]),
+            })
 
     final_result = None
-    table5 = soup.find(id="AutoNumber5")
-    if table5:
-        rows5 = table5.find_all("tr")
-        if len(rows5) > 2:
-            cols = rows5[2].find_all("td")
-            if len(cols) > 2:
-                final_result = cols[2].get_text(strip=True)
+    rows5 = _XP_T5_ROWS(tree)
+    if len(rows5) > 2:
+        cols = _XP_TDS(rows5[2])
+        if len(cols) > 2:
+            final_result = _cell_text(cols[2])
 
     return {"student": student, "marks": marks, "result": final_result}
 
 
-def worker(htno):
-    print(f"Fetching {htno} ...")
+async def worker(client, semaphore, parse_pool, htno):
     try:
-        data = fetch_result(htno)
+        async with semaphore:
+            print(f"Fetching {htno} ...")
+            page = await fetch_page(client, htno)
+        # parse off the event loop so fetching continues meanwhile
+        data = None
+        if page:
+            data = await asyncio.get_running_loop().run_in_executor(parse_pool, parse_result, *page)
         if data:
             # append immediately to disk for visibility and durability
-            results.append(data)
             append_result(data)
             print(f"  ✔ SAVED {htno}")
         else:
@@ -221,31 +359,48 @@ def worker(htno):
                 "result": None,
                 "status": "NO_RESULT",
             }
-            results.append(placeholder)
             append_result(placeholder)
             print(f"  ⚠ NO RESULT {htno} — placeholder saved")
     except Exception as e:
         print(f"  ✖ ERROR {htno}: {e}")
 
 
+async def run_all(ht_numbers):
+    """Fetch every hall ticket over one pooled client, MAX_WORKERS requests at a time,
+    and parse the result pages on a separate PARSE_WORKERS thread pool.
+    """
+    # Pool sized to the concurrency so every in-flight request can keep its connection alive
+    limits = httpx.Limits(max_connections=MAX_WORKERS, max_keepalive_connections=MAX_WORKERS)
+    semaphore = asyncio.Semaphore(MAX_WORKERS)
+    # verify=False: the results site's certificate chain does not validate
+    transport = httpx.AsyncHTTPTransport(http2=True, verify=False, limits=limits, retries=MAX_RETRIES)
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as parse_pool:
+        async with httpx.AsyncClient(transport=transport, headers=HEADERS, timeout=15) as client:
+            await asyncio.gather(*(worker(client, semaphore, parse_pool, htno) for htno in ht_numbers))
+
+
 def main():
     # Declare globals early to avoid SyntaxError when module-level names are referenced as defaults
-    global URL, START_HT, END_HT, MAX_WORKERS, OUTPUT_FILE, HEADERS, NDJSON_FILE, AUTO_EXCEL, AUTO_EXCEL_INTERVAL, PROTECT_PASSWORD
+    global URL, START_HT, END_HT, MAX_WORKERS, OUTPUT_FILE, HEADERS, NDJSON_FILE, AUTO_EXCEL, AUTO_EXCEL_INTERVAL, AUTO_EXCEL_MIN_ROWS, AUTO_EXCEL_MAX_AGE, PROTECT_PASSWORD
 
     parser = argparse.ArgumentParser(description="Fetch exam results by hall ticket range.")
     parser.add_argument("--url", help="Exam result page URL (interactive prompt shown if omitted)", default=None)
     parser.add_argument("--start", type=int, help="Start hall ticket number", default=None)
     parser.add_argument("--end", type=int, help="End hall ticket number", default=None)
-    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS, help="Thread pool size")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS, help="Maximum number of requests in flight")
     parser.add_argument("--output", default=OUTPUT_FILE, help="Output Excel (.xlsx) file")
     parser.add_argument("--no-auto-excel", dest="auto_excel", action="store_false", help="Disable automatic Excel generation during the run")
-    parser.add_argument("--auto-excel-interval", type=int, default=AUTO_EXCEL_INTERVAL, help="Auto-Excel worker interval in seconds")
+    parser.add_argument("--auto-excel-interval", type=int, default=AUTO_EXCEL_INTERVAL, help="Seconds between Auto-Excel threshold checks (rebuilds follow --auto-excel-min-rows / --auto-excel-max-age)")
+    parser.add_argument("--auto-excel-min-rows", type=int, default=AUTO_EXCEL_MIN_ROWS, help="Rebuild the Excel file once this many new results arrived")
+    parser.add_argument("--auto-excel-max-age", type=int, default=AUTO_EXCEL_MAX_AGE, help="Rebuild the Excel file once the oldest result not yet in it is this many seconds old")
     parser.add_argument("--protect-password", help="Password to protect the grades sheet (optional)", default=None)
     args = parser.parse_args()
 
     # Set runtime globals from args
     AUTO_EXCEL = args.auto_excel
     AUTO_EXCEL_INTERVAL = args.auto_excel_interval
+    AUTO_EXCEL_MIN_ROWS = args.auto_excel_min_rows
+    AUTO_EXCEL_MAX_AGE = args.auto_excel_max_age
     PROTECT_PASSWORD = args.protect_password
 
     # Interactive prompts if arguments are not provided (prompt order: URL -> start -> end)
@@ -307,151 +462,26 @@ def main():
 
     print("Clearing old results...")
     clear_old_results()
+    start_ndjson_writer()
 
     # Start the auto-excel thread (if enabled)
     start_auto_excel()
 
     ht_numbers = [str(ht) for ht in range(START_HT, END_HT + 1)]
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(worker, htno) for htno in ht_numbers]
-        for _ in as_completed(futures):
-            pass
+    asyncio.run(run_all(ht_numbers))
+
+    # Write out and fsync whatever is still queued
+    stop_ndjson_writer()
 
     # Stop the auto-excel worker before final conversion
     stop_auto_excel()
 
-    # Convert NDJSON into a final JSON array for compatibility
-    print("\nConverting incremental results to final JSON array...")
-    final = []
-    with open(NDJSON_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                final.append(json.loads(line))
-            except Exception:
-                continue
+    # Stream the NDJSON staging file into the final workbook
+    print("\nConverting incremental results to Excel...")
+    from json_to_excel import iter_entries, entries_to_excel
 
-    # Convert final list into richer Excel sheets: flattened results, marks, and raw JSON
-    def flatten_top(item):
-        flat = {}
-        for k, v in item.items():
-            if isinstance(v, dict):
-                for k2, v2 in v.items():
-                    flat[f"{k}.{k2}"] = v2
-            elif isinstance(v, list):
-                continue
-            else:
-                flat[k] = v
-        return flat
-
-    results_rows = []
-    marks_rows = []
-    for item in final:
-        flat = flatten_top(item)
-        # Add explicit top-level hallticket for joining later
-        flat["hallticket"] = (item.get("student") or {}).get("hallticket")
-        # Do NOT include _raw_json column as requested
-        results_rows.append(flat)
-
-        for m in item.get("marks", []):
-            mark_row = {"hallticket": (item.get("student") or {}).get("hallticket")}
-            for mk, mv in (m or {}).items():
-                mark_row[mk] = mv
-            marks_rows.append(mark_row)
-
-    df_results = pd.DataFrame(results_rows)
-    df_marks = pd.DataFrame(marks_rows)
-    raw_df = pd.DataFrame({"json": [json.dumps(i, ensure_ascii=False) for i in final]})
-
-    # Ensure mark sheet has standard columns
-    expected_mark_cols = ["hallticket", "code", "subject", "credits", "grade"]
-    if df_marks.empty:
-        df_marks = pd.DataFrame(columns=expected_mark_cols)
-    else:
-        df_marks = df_marks.reindex(columns=expected_mark_cols).fillna("")
-
-    # Pivot marks to create per-subject columns for grade, credits, subject
-    if not df_marks.empty:
-        df_grade_pivot = df_marks.pivot_table(index="hallticket", columns="code", values="grade", aggfunc="first")
-        df_credits_pivot = df_marks.pivot_table(index="hallticket", columns="code", values="credits", aggfunc="first")
-        df_subject_pivot = df_marks.pivot_table(index="hallticket", columns="code", values="subject", aggfunc="first")
-
-        # Rename columns to include type prefixes
-        df_grade_pivot.columns = [f"grade_{str(c)}" for c in df_grade_pivot.columns]
-        df_credits_pivot.columns = [f"credits_{str(c)}" for c in df_credits_pivot.columns]
-        df_subject_pivot.columns = [f"subject_{str(c)}" for c in df_subject_pivot.columns]
-
-        # Merge pivots into df_results on hallticket
-        df_results = df_results.merge(df_grade_pivot.reset_index(), on="hallticket", how="left")
-        df_results = df_results.merge(df_credits_pivot.reset_index(), on="hallticket", how="left")
-        df_results = df_results.merge(df_subject_pivot.reset_index(), on="hallticket", how="left")
-
-        # Reorder columns: core fields first, then subject columns ordered by frequency (common first, uncommon last)
-        core_pref = ["hallticket", "student.name", "student.father", "student.gender", "student.course", "result", "status"]
-        core_cols = [c for c in core_pref if c in df_results.columns]
-        code_counts = df_marks['code'].value_counts() if not df_marks.empty else []
-        codes_sorted = list(code_counts.index) if len(code_counts) else []
-
-        subject_cols = []
-        for code in codes_sorted:
-            for prefix in (f"grade_{code}", f"credits_{code}", f"subject_{code}"):
-                if prefix in df_results.columns:
-                    subject_cols.append(prefix)
-        remaining = [c for c in df_results.columns if (c.startswith('grade_') or c.startswith('credits_') or c.startswith('subject_')) and c not in subject_cols]
-        subject_cols.extend(sorted(remaining))
-
-        other_cols = [c for c in df_results.columns if c not in core_cols + subject_cols]
-        final_cols = core_cols + subject_cols + other_cols
-        df_results = df_results.reindex(columns=final_cols)
-
-        # Sort by hallticket ascending when possible
-        try:
-            df_results['hallticket_sort'] = df_results['hallticket'].astype(int)
-            df_results = df_results.sort_values('hallticket_sort').drop(columns=['hallticket_sort'])
-        except Exception:
-            df_results = df_results.sort_values('hallticket')
-
-    # Write sheets in the workbook
-    with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
-        df_results.to_excel(writer, sheet_name="results", index=False)
-        # also write grades pivot (just grades) for convenience
-        if not df_marks.empty:
-            df_grade_only = df_grade_pivot.reset_index()
-            df_grade_only.to_excel(writer, sheet_name="grades", index=False)
-        else:
-            pd.DataFrame(columns=["hallticket"]).to_excel(writer, sheet_name="grades", index=False)
-        df_marks.to_excel(writer, sheet_name="marks", index=False)
-        raw_df.to_excel(writer, sheet_name="raw", index=False)
-
-    # Optionally protect grades sheet (lock grade cells)
-    if args.protect_password:
-        try:
-            from openpyxl import load_workbook
-            from openpyxl.styles import Protection
-        except Exception:
-            print("Error: openpyxl required for protecting the spreadsheet.")
-            return
-
-        wb = load_workbook(OUTPUT_FILE)
-        if "grades" in wb.sheetnames:
-            ws = wb["grades"]
-            # Unlock all cells first
-            for row in ws.iter_rows():
-                for cell in row:
-                    cell.protection = Protection(locked=False)
-            # Lock grade cells (all except header and hallticket column)
-            max_col = ws.max_column
-            max_row = ws.max_row
-            for r in range(2, max_row + 1):
-                for c in range(2, max_col + 1):
-                    cell = ws.cell(row=r, column=c)
-                    cell.protection = Protection(locked=True)
-            ws.protection.sheet = True
-            ws.protection.set_password(args.protect_password)
-            wb.save(OUTPUT_FILE)
+    entries_to_excel(iter_entries(Path(NDJSON_FILE)), Path(OUTPUT_FILE), PROTECT_PASSWORD)
 
     print(f"\nDONE. Excel saved to {OUTPUT_FILE}")
 
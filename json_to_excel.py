@@ -8,179 +8,236 @@ If `input.json` is NDJSON (one JSON object per line) it will be handled.
 """
 
 import argparse
-import json
+import itertools
 import sys
+from collections import Counter
 from pathlib import Path
 
+import orjson
+
 try:
-    import pandas as pd
+    import xlsxwriter
 except Exception:
-    pd = None
+    xlsxwriter = None
 
 
-def load_items(path: Path):
-    txt = path.read_text(encoding="utf-8").strip()
-    if not txt:
-        return []
-    if txt.startswith("["):
-        return json.loads(txt)
-    items = []
-    for line in txt.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            items.append(json.loads(line))
-        except Exception:
-            # skip malformed lines
-            continue
-    return items
+def iter_entries(path: Path):
+    """Yield (line, item) pairs from an NDJSON file, line by line; malformed lines are skipped.
 
+    line is the item's JSON text as stored, reused for the raw sheet. For a JSON
+    array file it is None and the item is serialized when the sheet is built.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("["):
+                # JSON array: parse the whole document at once
+                for item in orjson.loads(line + f.read()):
+                    yield None, item
+                return
+            try:
+                yield line, orjson.loads(line)
+            except Exception:
+                # skip malformed lines
+                continue
 
-def items_to_excel(items, out_path: Path, protect_password: str = None):
-    if pd is None:
-        print("Error: pandas and openpyxl are required. Install: python -m pip install pandas openpyxl")
-        sys.exit(2)
 
-    # Helper to flatten top-level dicts (skip lists)
-    def flatten_top(item):
-        flat = {}
-        for k, v in item.items():
-            if isinstance(v, dict):
-                for k2, v2 in v.items():
-                    flat[f"{k}.{k2}"] = v2
-            elif isinstance(v, list):
-                # skip lists (handled separately)
-                continue
-            else:
-                flat[k] = v
-        return flat
-
-    rows = []
-    marks = []
-    for item in items:
-        # Flatten top-level keys (student.* becomes columns, etc.)
-        flat = flatten_top(item)
-        # Add explicit top-level hallticket for joining later
-        flat["hallticket"] = (item.get("student") or {}).get("hallticket")
-        # Do NOT include raw JSON in results
-        rows.append(flat)
-
-        # Marks: collect all marks (if any)
+def iter_items(path: Path):
+    """Yield result items from a JSON array file, or line by line from an NDJSON file."""
+    for _, item in iter_entries(path):
+        yield item
+
+
+def load_items(path: Path):
+    return list(iter_items(path))
+
+
+def _new_workbook(out_path: Path):
+    # constant_memory flushes each row to disk as soon as it is written, so the
+    # workbook is never held in RAM; rows must come in order within each sheet,
+    # but sheets may be written in any interleaving
+    return xlsxwriter.Workbook(str(out_path), {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+
+
+def _write_sheet(wb, ws, header, rows, protect_password: str = None):
+    """Write the header and rows to ws; no styling is applied.
+
+    With a password the sheet is protected: data cells stay locked, the header
+    row and first (hallticket) column are left editable.
+    """
+    if not protect_password:
+        ws.write_row(0, 0, header)
+        for r, row in enumerate(rows, start=1):
+            ws.write_row(r, 0, row)
+        return
+    unlocked = wb.add_format({"locked": False})
+    ws.protect(protect_password)
+    ws.write_row(0, 0, header, unlocked)
+    for r, row in enumerate(rows, start=1):
+        ws.write(r, 0, row[0], unlocked)
+        ws.write_row(r, 1, row[1:])
+
+
+def write_workbook(out_path: Path, sheets, protect_password: str = None):
+    """Stream (title, header, rows) sheets into an xlsxwriter workbook.
+
+    rows is any iterable of row tuples (e.g. zip(*columns) for column-major
+    data). With a password the grades sheet is protected (see _write_sheet).
+    """
+    wb = _new_workbook(out_path)
+    for title, header, rows in sheets:
+        _write_sheet(wb, wb.add_worksheet(title), header, rows,
+                     protect_password if title == "grades" else None)
+    wb.close()
+
+
+def _cell(value):
+    # Missing values become empty cells
+    return "" if value is None else value
+
+
+def build_final_frame(entries):
+    """Build the sheet data from (line, item) pairs (see iter_entries) in a single pass.
+
+    Returns (results, marks, grades) for the ordered results sheet, the long
+    marks sheet and the grades-per-code sheet. Each is a (header, columns) pair
+    with one list of cell values per column.
+    """
+    # Results columns, filled per item
+    halltickets, students, results, statuses = [], [], [], []
+    # student.* keys in first-seen order (dict used as an ordered set)
+    student_keys = {}
+    # Marks columns, filled per mark
+    mark_cols = {k: [] for k in ("hallticket", "code", "subject", "credits", "grade")}
+    # hallticket -> {code: (grade, credits, subject)}; the first mark wins for a repeated code
+    marks_by_ht = {}
+    code_counts = Counter()
+
+    for _, item in entries:
+        student = item.get("student") or {}
+        ht = student.get("hallticket")
+        halltickets.append(ht)
+        students.append(student)
+        results.append(_cell(item.get("result")))
+        statuses.append(_cell(item.get("status")))
+        student_keys.update(dict.fromkeys(student))
+
         for m in item.get("marks", []):
-            mark_row = {"hallticket": (item.get("student") or {}).get("hallticket")}
-            for mk, mv in (m or {}).items():
-                mark_row[mk] = mv
-            marks.append(mark_row)
-
-    df_rows = pd.DataFrame(rows)
-    df_marks = pd.DataFrame(marks)
-
-    # Ensure expected mark columns exist and are first/ordered
-    expected_mark_cols = ["hallticket", "code", "subject", "credits", "grade"]
-    if df_marks.empty:
-        df_marks = pd.DataFrame(columns=expected_mark_cols)
-    else:
-        df_marks = df_marks.reindex(columns=expected_mark_cols).fillna("")
-
-    # Pivot marks to create per-subject columns for grade, credits, subject (if any marks exist)
-    if not df_marks.empty:
-        # grade pivots keyed by code (codes as column names)
-        df_grade_codes = df_marks.pivot_table(index="hallticket", columns="code", values="grade", aggfunc="first")
-        df_credits_pivot = df_marks.pivot_table(index="hallticket", columns="code", values="credits", aggfunc="first")
-        df_subject_pivot = df_marks.pivot_table(index="hallticket", columns="code", values="subject", aggfunc="first")
-
-        # Merge pivots into df_rows on hallticket
-        df_rows = df_rows.merge(df_grade_codes.reset_index(), on="hallticket", how="left")
-        df_rows = df_rows.merge(df_credits_pivot.reset_index().rename(columns=lambda x: f"credits_{x}" if x != 'hallticket' else x), on="hallticket", how="left")
-        df_rows = df_rows.merge(df_subject_pivot.reset_index().rename(columns=lambda x: f"subject_{x}" if x != 'hallticket' else x), on="hallticket", how="left")
-
-    # Reorder columns: exactly -> hallticket, name, father, subject-code columns, then result
-    core_pref = ["hallticket", "student.name", "student.father"]
-    core_cols = [c for c in core_pref if c in df_rows.columns]
+            m = m or {}
+            code = _cell(m.get("code"))
+            subject = _cell(m.get("subject"))
+            credits = _cell(m.get("credits"))
+            grade = _cell(m.get("grade"))
+            mark_cols["hallticket"].append(_cell(ht))
+            mark_cols["code"].append(code)
+            mark_cols["subject"].append(subject)
+            mark_cols["credits"].append(credits)
+            mark_cols["grade"].append(grade)
+            marks_by_ht.setdefault(ht, {}).setdefault(code, (grade, credits, subject))
+            code_counts[code] += 1
 
     # Determine codes ordered by frequency (descending)
-    code_counts = df_marks['code'].value_counts() if not df_marks.empty else pd.Series([], dtype=int)
-    codes_sorted = list(code_counts.index) if len(code_counts) else []
+    codes_sorted = [c for c, _ in code_counts.most_common()]
 
     # Separate lab codes which should appear between common and uncommon subjects
-    labs = [c for c in codes_sorted if 'LAB' in c]
-    non_labs = [c for c in codes_sorted if c not in labs]
+    # (one partitioning pass; no per-code membership scans of the lab list)
+    labs = []
+    non_labs = []
+    for c in codes_sorted:
+        (labs if 'LAB' in c else non_labs).append(c)
 
     # Split non-labs into common and uncommon halves (common first)
     half = len(non_labs) // 2
     common = non_labs[:half]
     uncommon = non_labs[half:]
 
-    # Final subject code order: common, labs, uncommon (only include codes present in df_rows)
-    subject_codes_ordered = [c for c in (common + labs + uncommon) if c in df_rows.columns]
+    # Final subject code order: common, labs, uncommon
+    subject_codes_ordered = common + labs + uncommon
 
-    # Ensure 'result' is appended at the end
-    final_cols = core_cols + subject_codes_ordered
-    if 'result' in df_rows.columns:
-        final_cols.append('result')
+    # Sort rows by hallticket ascending (numerically when possible)
+    try:
+        keys = [int(ht) for ht in halltickets]
+    except Exception:
+        keys = [(ht is None, str(ht)) for ht in halltickets]
+    order = sorted(range(len(halltickets)), key=keys.__getitem__)
+
+    # Columns: core fields (hallticket, name, father, gender, course, result, status),
+    # then grade_/credits_/subject_ per code in subject order, then other student.* fields
+    core_keys = [k for k in ("name", "father", "gender", "course") if k in student_keys]
+    header = ["hallticket"] + [f"student.{k}" for k in core_keys] + ["result", "status"]
+    columns = [[_cell(halltickets[i]) for i in order]]
+    columns += [[_cell(students[i].get(k)) for i in order] for k in core_keys]
+    columns.append([results[i] for i in order])
+    columns.append([statuses[i] for i in order])
+
+    no_marks = {}
+    row_marks = [marks_by_ht.get(halltickets[i], no_marks) for i in order]
+    for code in subject_codes_ordered:
+        cells = [m.get(code, ("", "", "")) for m in row_marks]
+        for n, prefix in enumerate(("grade", "credits", "subject")):
+            header.append(f"{prefix}_{code}")
+            columns.append([c[n] for c in cells])
+
+    for k in student_keys:
+        if k not in core_keys:
+            header.append(f"student.{k}")
+            columns.append([_cell(students[i].get(k)) for i in order])
+
+    # Grades sheet: one row per hallticket with marks, codes as columns
+    grade_hts = sorted(marks_by_ht, key=str)
+    grade_codes = sorted(code_counts)
+    grades = (
+        ["hallticket"] + grade_codes,
+        [grade_hts] + [[marks_by_ht[ht][code][0] if code in marks_by_ht[ht] else None for ht in grade_hts]
+                       for code in grade_codes],
+    )
+
+    return (header, columns), (list(mark_cols), list(mark_cols.values())), grades
+
+
+def _stream_raw(entries, ws):
+    """Pass (line, item) pairs through, writing each item's JSON text to the raw sheet.
+
+    Stored lines are written as they are; items without one are serialized.
+    """
+    ws.write_row(0, 0, ["json"])
+    for r, (line, item) in enumerate(entries, start=1):
+        ws.write(r, 0, line if line is not None else orjson.dumps(item).decode("utf-8"))
+        yield line, item
+
+
+def entries_to_excel(entries, out_path: Path, protect_password: str = None):
+    """Write the results workbook from (line, item) pairs, e.g. iter_entries().
+
+    Every sheet comes from this single pass over the entries: the raw sheet is
+    streamed while the pass runs, the other sheets are written once it is done.
+    """
+    if xlsxwriter is None:
+        print("Error: xlsxwriter is required. Install: python -m pip install xlsxwriter")
+        sys.exit(2)
 
-    # Add any missing subject-code columns (alphabetically) that might exist (as fallback)
-    remaining_code_cols = [c for c in df_rows.columns if c not in final_cols and isinstance(c, str) and c.isupper() and not c.startswith(('credits_','subject_'))]
-    remaining_code_cols = sorted(remaining_code_cols)
-    final_cols = final_cols + remaining_code_cols
+    wb = _new_workbook(out_path)
+    # Sheets: results (final ordered), grades (pivot), marks (long), raw (original JSON lines);
+    # all are added up front so the tabs keep this order
+    sheets = {title: wb.add_worksheet(title) for title in ("results", "grades", "marks", "raw")}
 
-    # Fill missing columns with empty strings and reindex
-    for c in final_cols:
-        if c not in df_rows.columns:
-            df_rows[c] = ""
-    df_rows = df_rows.reindex(columns=final_cols)
-    df_rows = df_rows.fillna("")
+    results, marks, grades = build_final_frame(_stream_raw(entries, sheets["raw"]))
 
-    # Sort by hallticket ascending when possible
-    try:
-        df_rows['hallticket_sort'] = df_rows['hallticket'].astype(int)
-        df_rows = df_rows.sort_values('hallticket_sort').drop(columns=['hallticket_sort'])
-    except Exception:
-        df_rows = df_rows.sort_values('hallticket')
-
-    # Prepare raw sheet
-    raw_df = pd.DataFrame({"json": [json.dumps(i, ensure_ascii=False) for i in items]})
-
-    # Write sheets: results (final ordered), marks (long), grades (pivot), raw (original JSON lines)
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        df_rows.to_excel(writer, sheet_name="results", index=False)
-        if not df_marks.empty:
-            # write a grades sheet that shows grades per code (codes as columns)
-            df_grade_only = df_grade_codes.reset_index()
-            df_grade_only.to_excel(writer, sheet_name="grades", index=False)
-        else:
-            pd.DataFrame(columns=["hallticket"]).to_excel(writer, sheet_name="grades", index=False)
-        df_marks.to_excel(writer, sheet_name="marks", index=False)
-        raw_df.to_excel(writer, sheet_name="raw", index=False)
-
-    # Optionally protect the grades sheet (lock grade cells)
-    if protect_password:
-        try:
-            from openpyxl import load_workbook
-            from openpyxl.styles import Protection
-        except Exception:
-            print("Error: openpyxl required for protecting the spreadsheet.")
-            return
-
-        wb = load_workbook(out_path)
-        if "grades" in wb.sheetnames:
-            ws = wb["grades"]
-            # Unlock all cells first
-            for row in ws.iter_rows():
-                for cell in row:
-                    cell.protection = Protection(locked=False)
-            # Lock grade cells (all except header and hallticket column)
-            max_col = ws.max_column
-            max_row = ws.max_row
-            # find hallticket column index (assumed first column)
-            for r in range(2, max_row + 1):
-                for c in range(2, max_col + 1):
-                    cell = ws.cell(row=r, column=c)
-                    cell.protection = Protection(locked=True)
-            ws.protection.sheet = True
-            ws.protection.set_password(protect_password)
-            wb.save(out_path)
+    for title, (header, columns) in (("results", results), ("grades", grades), ("marks", marks)):
+        _write_sheet(wb, sheets[title], header, zip(*columns),
+                     protect_password if title == "grades" else None)
+    wb.close()
+
+
+def items_to_excel(items, out_path: Path, protect_password: str = None):
+    """Write the results workbook for items (any iterable); the raw sheet re-serializes them."""
+    entries_to_excel(((None, item) for item in items), out_path, protect_password)
 
 
 def main():
@@ -199,12 +256,15 @@ def main():
 
     out = Path(args.output) if args.output else inp.with_suffix(".xlsx")
 
-    items = load_items(inp)
-    if not items:
+    # One read of the input: NDJSON lines go straight to the raw sheet, a JSON array
+    # is parsed once and serialized once while the sheets are built
+    entries = iter_entries(inp)
+    first = next(entries, None)
+    if first is None:
         print("No data found in input file.")
         sys.exit(1)
 
-    items_to_excel(items, out, protect_password)
+    entries_to_excel(itertools.chain([first], entries), out, protect_password)
     print(f"Done — Excel saved to {out}")
 
 